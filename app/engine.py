@@ -1,9 +1,38 @@
 from __future__ import annotations
 
+from collections import OrderedDict, deque
+from collections.abc import Mapping, MutableMapping
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Awaitable, Callable, Dict, List, Optional, Literal
+from itertools import islice
+from functools import partial
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Literal, Set, Tuple
 import asyncio
-from pydantic import BaseModel
+import atexit
+import json
+import multiprocessing
+import operator as _op
+import os
+import sqlite3
+import tempfile
+import threading
+import orjson
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+
+# ------------ JSON ------------
+
+def dumps_json(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """
+    Encodes with orjson, falling back to the stdlib encoder for values orjson
+    rejects, such as ints wider than 64 bits.
+    """
+    try:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        return json.dumps(obj, default=default, ensure_ascii=False, separators=(",", ":")).encode()
+
 
 # ------------ Tool registry ------------
 
@@ -13,35 +42,81 @@ ToolFunc = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
 class ToolRegistry:
     def __init__(self) -> None:
         self._tools: Dict[str, ToolFunc] = {}
-
-    def register(self, name: str, func: Callable[[Dict[str, Any]], Any]) -> None:
+        # the functions as registered, before wrapping
+        self._funcs: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        # bumped on every register(), so cached plans know to rebind tools
+        self.version = 0
+
+    def register(
+        self,
+        name: str,
+        func: Callable[[Dict[str, Any]], Any],
+        is_cpu_bound: bool = True,
+    ) -> None:
         """
         Register a sync or async function as a tool.
+        Sync tools run in the default thread pool so they don't block the
+        event loop; pass is_cpu_bound=False for tiny tools to skip the hop.
         """
         if asyncio.iscoroutinefunction(func):
             async_func = func  # type: ignore[assignment]
+        elif is_cpu_bound:
+            async def async_func(state: Dict[str, Any]) -> Dict[str, Any]:
+                return await asyncio.to_thread(func, state)
         else:
             async def async_func(state: Dict[str, Any]) -> Dict[str, Any]:
                 return func(state)  # type: ignore[call-arg]
 
         self._tools[name] = async_func  # type: ignore[assignment]
+        self._funcs[name] = func
+        self.version += 1
 
     def get(self, name: str) -> ToolFunc:
         if name not in self._tools:
             raise KeyError(f"Tool '{name}' is not registered")
         return self._tools[name]
 
+    def snapshot(self) -> Dict[str, Callable[[Dict[str, Any]], Any]]:
+        """
+        The currently registered functions by name, e.g. to remember which
+        tools pool workers register on start-up.
+        """
+        return dict(self._funcs)
+
 
 tool_registry = ToolRegistry()
 
+# Scratch space shared by the tool calls of one run, e.g. for work several
+# tools would otherwise repeat. Set by execute_graph (asyncio.to_thread
+# copies it into tool threads); never part of the state or the log.
+run_cache: ContextVar[Optional[Dict[Any, Any]]] = ContextVar("run_cache", default=None)
+
 
 # ------------ Graph models ------------
 
+# (node name, tool, next step index for the state the tool returned)
+PlanStep = Tuple[str, ToolFunc, Callable[[Dict[str, Any]], Optional[int]]]
+# (steps, index of the start node)
+Plan = Tuple[List[PlanStep], int]
+# generated runner: (run, record) -> None, see compile_graph()
+CompiledGraph = Callable[["Run", Callable[[str], Awaitable[None]]], Awaitable[None]]
+
+
 class NodeDef(BaseModel):
     name: str
     tool: str  # tool name registered in ToolRegistry
 
 
+_OPS: Dict[str, Callable[[Any, Any], Any]] = {
+    "eq": _op.eq,
+    "ne": _op.ne,
+    "lt": _op.lt,
+    "gt": _op.gt,
+    "lte": _op.le,
+    "gte": _op.ge,
+}
+
+
 class EdgeDef(BaseModel):
     from_node: str
     to_node: str
@@ -49,6 +124,14 @@ class EdgeDef(BaseModel):
     operator: Literal["eq", "ne", "lt", "gt", "lte", "gte"] = "eq"
     value: Optional[Any] = None
 
+    # comparison function for `operator`, resolved once at validation
+    _cmp: Callable[[Any, Any], Any] = PrivateAttr(default=_op.eq)
+
+    @model_validator(mode="after")
+    def _resolve_operator(self) -> "EdgeDef":
+        self._cmp = _OPS[self.operator]
+        return self
+
 
 class GraphDef(BaseModel):
     id: str
@@ -56,6 +139,38 @@ class GraphDef(BaseModel):
     edges: List[EdgeDef]
     start_node: str
 
+    # outgoing edges per node, in declaration order
+    _out: Dict[str, List[EdgeDef]] = PrivateAttr(default_factory=dict)
+    # execution plan built by compile_plan() on first run
+    _plan: Optional[Plan] = PrivateAttr(default=None)
+    # tool_registry.version the plan was built against
+    _plan_version: int = PrivateAttr(default=-1)
+    # generated runner built by compile_graph() once the graph is hot
+    _compiled: Optional[CompiledGraph] = PrivateAttr(default=None)
+    _runs: int = PrivateAttr(default=0)
+
+    @model_validator(mode="after")
+    def _index_edges(self) -> "GraphDef":
+        out: Dict[str, List[EdgeDef]] = {}
+        for edge in self.edges:
+            out.setdefault(edge.from_node, []).append(edge)
+        self._out = out
+        return self
+
+    def __getstate__(self) -> Dict[Any, Any]:
+        # the plan and generated runner hold tool closures, which can't be
+        # sent to pool workers; each process rebuilds its own. The run count
+        # stays behind too: a worker gets a fresh copy per run, so it would
+        # only ever compile if the parent's count came along.
+        state = super().__getstate__()
+        state["__pydantic_private__"] = {
+            **state["__pydantic_private__"],
+            "_plan": None,
+            "_compiled": None,
+            "_runs": 0,
+        }
+        return state
+
 
 class RunStatus(str, Enum):
     PENDING = "PENDING"
@@ -64,9 +179,19 @@ class RunStatus(str, Enum):
     FAILED = "FAILED"
 
 
-class RunLogEntry(BaseModel):
+@dataclass(slots=True)
+class RunLogEntry:
     node: str
-    state_snapshot: Dict[str, Any]
+    state_delta: Dict[str, Any]  # keys whose value changed at this node
+    removed: List[str] = field(default_factory=list)  # keys deleted at this node
+
+    def apply(self, state: Dict[str, Any]) -> None:
+        """
+        Folds this entry into `state`, the state as of the previous entry.
+        """
+        for key in self.removed:
+            state.pop(key, None)
+        state.update(self.state_delta)
 
 
 class Run(BaseModel):
@@ -75,71 +200,567 @@ class Run(BaseModel):
     status: RunStatus = RunStatus.PENDING
     current_node: Optional[str] = None
     state: Dict[str, Any] = {}
-    log: List[RunLogEntry] = []
+    log: Deque[RunLogEntry] = Field(default_factory=deque)
     error: Optional[str] = None
 
+    # wakes log listeners when an entry is appended or the run finishes
+    _changed: asyncio.Condition = PrivateAttr(default_factory=asyncio.Condition)
+    # set by RunStore; called once, on the first notify after finishing
+    _on_finish: Optional[Callable[[], None]] = PrivateAttr(default=None)
+    # log entries encoded so far by serialize_log(), and the state they fold to
+    _encoded_log: List[bytes] = PrivateAttr(default_factory=list)
+    _encoded_state: Dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (RunStatus.COMPLETED, RunStatus.FAILED)
+
+    async def notify_changed(self) -> None:
+        if self._on_finish is not None and self.finished:
+            on_finish, self._on_finish = self._on_finish, None
+            on_finish()
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def wait_for_changes(self, seen: int) -> None:
+        """
+        Blocks until the log has more than `seen` entries or the run is finished.
+        """
+        async with self._changed:
+            await self._changed.wait_for(lambda: len(self.log) > seen or self.finished)
 
-# ------------ In-memory stores ------------
-
-GRAPHS: Dict[str, GraphDef] = {}
-RUNS: Dict[str, Run] = {}
-
-
-# ------------ Engine logic ------------
 
-def _compare(a: Any, op: str, b: Any) -> bool:
-    if op == "eq":
-        return a == b
-    if op == "ne":
-        return a != b
-    if op == "lt":
-        return a < b
-    if op == "gt":
-        return a > b
-    if op == "lte":
-        return a <= b
-    if op == "gte":
-        return a >= b
-    raise ValueError(f"Unsupported operator: {op}")
+# ------------ In-memory stores ------------
 
+class RunStore:
+    """
+    Bounded LRU store of runs. Past `maxsize`, the least recently used
+    finished runs are moved to a sqlite archive and read back from there
+    on a miss. Runs still executing are never evicted.
+    Without an `archive_path` the archive is a temporary file, removed at exit.
+    """
+
+    def __init__(self, maxsize: int = 10_000, archive_path: Optional[str] = None) -> None:
+        # running runs move to the LRU once they finish, so eviction never
+        # has to skip over them
+        self._running: Dict[str, Run] = {}
+        self._finished: "OrderedDict[str, Run]" = OrderedDict()
+        self._maxsize = maxsize
+        self._archive_path = archive_path
+        self._db: Optional[sqlite3.Connection] = None  # opened on first eviction
+        self._db_lock = threading.Lock()
+        # archive writes happen on one background thread; runs stay readable
+        # from `_pending` until theirs has committed
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[str, Run] = {}
+
+    def __setitem__(self, run_id: str, run: Run) -> None:
+        self._running.pop(run_id, None)
+        self._finished.pop(run_id, None)
+        if run.finished:
+            self._finished[run_id] = run
+        else:
+            self._running[run_id] = run
+            run._on_finish = partial(self._run_finished, run_id, run)
+        self._evict()
+
+    def __contains__(self, run_id: object) -> bool:
+        return isinstance(run_id, str) and self.get(run_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._running) + len(self._finished)
+
+    def get(self, run_id: str, default: Optional[Run] = None) -> Optional[Run]:
+        run = self._running.get(run_id)
+        if run is not None:
+            return run
+        run = self._finished.get(run_id)
+        if run is not None:
+            self._finished.move_to_end(run_id)
+            return run
+        run = self._pending.get(run_id) or self._load(run_id)
+        return default if run is None else run
+
+    def _run_finished(self, run_id: str, run: Run) -> None:
+        if self._running.get(run_id) is run:
+            del self._running[run_id]
+            self._finished[run_id] = run
+            self._evict()
+
+    def _evict(self) -> None:
+        while len(self) > self._maxsize and self._finished:
+            self._archive(*self._finished.popitem(last=False))  # oldest first
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            if self._archive_path is None:
+                fd, self._archive_path = tempfile.mkstemp(prefix="runs-", suffix=".sqlite3")
+                os.close(fd)
+                atexit.register(self._remove_archive)
+            # used from the writer thread and the event loop, under _db_lock
+            self._db = sqlite3.connect(self._archive_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS runs (id TEXT PRIMARY KEY, data BLOB NOT NULL)")
+        return self._db
+
+    def _remove_archive(self) -> None:
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+        if self._db is not None:
+            self._db.close()
+        try:
+            os.remove(self._archive_path)  # type: ignore[arg-type]
+        except OSError:
+            pass
+
+    def _archive(self, run_id: str, run: Run) -> None:
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="run-archive")
+        self._pending[run_id] = run
+        self._writer.submit(self._write, run_id, run)
+
+    def _write(self, run_id: str, run: Run) -> None:
+        fields = run.model_dump()
+        fields["log"] = list(fields["log"])
+        data = dumps_json(fields, default=str)
+        with self._db_lock:
+            with self._connect() as db:
+                db.execute("INSERT OR REPLACE INTO runs (id, data) VALUES (?, ?)", (run_id, data))
+            if self._pending.get(run_id) is run:
+                del self._pending[run_id]
+
+    def _load(self, run_id: str) -> Optional[Run]:
+        with self._db_lock:
+            if self._db is None:
+                return None
+            row = self._db.execute("SELECT data FROM runs WHERE id = ?", (run_id,)).fetchone()
+        # stdlib json: orjson reads ints wider than 64 bits back as floats
+        return Run.model_validate(json.loads(row[0])) if row else None
 
-def _next_node_name(graph: GraphDef, node_name: str, state: Dict[str, Any]) -> Optional[str]:
-    candidates = [e for e in graph.edges if e.from_node == node_name]
 
-    for edge in candidates:
-        if edge.condition_key is None:
-            # unconditional edge
-            return edge.to_node
+GRAPHS: Dict[str, GraphDef] = {}
+RUNS = RunStore(archive_path=os.environ.get("RUN_ARCHIVE_PATH"))
+
+
+# ------------ Log snapshots ------------
+
+def reconstruct_snapshot(log: Deque[RunLogEntry], index: int) -> Dict[str, Any]:
+    """
+    Full state as it was after log entry `index`.
+    """
+    snapshot: Dict[str, Any] = {}
+    for i, entry in enumerate(log):
+        if i > index:
+            break
+        entry.apply(snapshot)
+    return snapshot
+
+
+def serialize_log(run: Run) -> List[bytes]:
+    """
+    The run's log as encoded {"node", "state_snapshot"} objects, each entry's
+    delta folded into the full snapshot the API returns. Cached on the run as
+    bytes, so each call only folds and encodes the entries added since.
+    """
+    encoded = run._encoded_log
+    snapshot = run._encoded_state
+    for entry in islice(run.log, len(encoded), None):
+        entry.apply(snapshot)
+        encoded.append(dumps_json({"node": entry.node, "state_snapshot": snapshot}))
+    return encoded
+
+
+def committed_state(run: Run) -> Dict[str, Any]:
+    """
+    State of the run as of its last log entry. While a node runs, run.state
+    is the CowState its tool may be writing to from another thread; the
+    folded log is only ever updated on the event loop.
+    """
+    if isinstance(run.state, CowState):
+        serialize_log(run)
+        return run._encoded_state
+    return run.state
 
-        value_in_state = state.get(edge.condition_key)
-        if _compare(value_in_state, edge.operator, edge.value):
-            return edge.to_node
 
-    # no matching edge => terminate
-    return None
+# ------------ Engine logic ------------
 
+_MISSING = object()
+
+
+class CowState(MutableMapping):
+    """
+    Copy-on-write view handed to tools: reads fall through to `base`, the
+    state as of the last log entry, while writes go to `head` and deletions
+    are recorded in `removed`. head/removed are exactly the node's log entry.
+    """
+
+    __slots__ = ("head", "base", "removed")
+
+    def __init__(self, head: Dict[str, Any], base: Dict[str, Any]) -> None:
+        self.head = head
+        self.base = base
+        self.removed: Set[str] = set()
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.head:
+            return self.head[key]
+        if key in self.removed:
+            raise KeyError(key)
+        return self.base[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.head[key] = value
+        self.removed.discard(key)
+
+    def __delitem__(self, key: str) -> None:
+        if key in self.head:
+            del self.head[key]
+            if key in self.base:
+                self.removed.add(key)
+        elif key in self.base and key not in self.removed:
+            self.removed.add(key)
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.head or (key in self.base and key not in self.removed)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.head
+        for key in self.base:
+            if key not in self.head and key not in self.removed:
+                yield key
 
-async def execute_graph(graph: GraphDef, run: Run) -> None:
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def copy(self) -> Dict[str, Any]:
+        return dict(self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+def _make_next(edges: List[EdgeDef], index: Dict[str, int]) -> Callable[[Dict[str, Any]], Optional[int]]:
+    targets = [(e.condition_key, e._cmp, e.value, index[e.to_node]) for e in edges]
+
+    if not targets:
+        return lambda state: None
+    if targets[0][0] is None:
+        # unconditional edge first: no need to look at the state
+        target = targets[0][3]
+        return lambda state: target
+
+    def next_index(state: Dict[str, Any]) -> Optional[int]:
+        for key, cmp, value, target in targets:
+            if key is None or cmp(state.get(key), value):
+                return target
+        # no matching edge => terminate
+        return None
+
+    return next_index
+
+
+def _lazy_tool(steps: List[PlanStep], k: int, tool_name: str) -> ToolFunc:
+    """
+    Placeholder for step k's tool: looks the tool up on the first visit and
+    puts it in the plan, so nodes that are never reached need no tool.
+    """
+    async def resolve_and_call(state: Dict[str, Any]) -> Dict[str, Any]:
+        tool = tool_registry.get(tool_name)
+        name, _, next_index = steps[k]
+        steps[k] = (name, tool, next_index)
+        return await tool(state)
+
+    return resolve_and_call
+
+
+def _undefined_node(name: str) -> ToolFunc:
+    async def fail(state: Dict[str, Any]) -> Dict[str, Any]:
+        raise KeyError(f"Node '{name}' is not defined")
+
+    return fail
+
+
+def compile_plan(graph: GraphDef) -> Plan:
+    """
+    Flattens the graph into a list of steps with edges resolved to step
+    indices, so execution doesn't look up nodes or edges on every hop.
+    The plan is cached on the graph until a tool is registered; tools are
+    bound at first use, and an edge to an undefined node only fails the run
+    if it is taken.
+    """
+    if graph._plan is None or graph._plan_version != tool_registry.version:
+        graph._compiled = None  # binds the old plan's tools
+        if graph.start_node not in graph.nodes:
+            raise KeyError(f"Node '{graph.start_node}' is not defined")
+        names = list(graph.nodes)
+        names += sorted({e.to_node for e in graph.edges} - set(graph.nodes))
+        index = {name: i for i, name in enumerate(names)}
+
+        steps: List[PlanStep] = []
+        for k, name in enumerate(names):
+            node = graph.nodes.get(name)
+            tool = _lazy_tool(steps, k, node.tool) if node else _undefined_node(name)
+            steps.append((name, tool, _make_next(graph._out.get(name, []), index)))
+        graph._plan = (steps, index[graph.start_node])
+        graph._plan_version = tool_registry.version
+    return graph._plan
+
+
+async def _interpret(plan: Plan, run: Run, record: Callable[[str], Awaitable[None]]) -> None:
+    steps, start = plan
+    i: Optional[int] = start
+    while i is not None:
+        node_name, tool, next_index = steps[i]
+        run.current_node = node_name
+
+        # call node tool
+        run.state = await tool(run.state)
+        await record(node_name)
+
+        # compute next node (supports branching + loops)
+        i = next_index(run.state)
+
+
+# graphs run more often than this get a generated runner (see compile_graph)
+COMPILE_AFTER_RUNS = 20
+
+
+def compile_graph(graph: GraphDef) -> CompiledGraph:
+    """
+    Generates and compiles a coroutine that runs the graph as straight-line
+    code: one `if i == k` block per node in plan order, so a forward edge
+    falls through to the next block and only backward edges go round the
+    `while` loop. Tools, comparators and edge values are bound as globals of
+    the generated code rather than embedded in the source.
+    """
+    steps, start = compile_plan(graph)
+    if graph._compiled is not None:
+        return graph._compiled
+
+    index = {name: i for i, (name, _, _) in enumerate(steps)}
+    namespace: Dict[str, Any] = {}
+    src = [
+        "async def _run(run, record):",
+        f"    i = {start}",
+        "    while i is not None:",
+    ]
+
+    for k, (name, tool, _) in enumerate(steps):
+        namespace[f"n{k}"] = name
+        namespace[f"t{k}"] = tool
+        src += [
+            f"        if i == {k}:",
+            f"            run.current_node = n{k}",
+            f"            run.state = await t{k}(run.state)",
+            f"            await record(n{k})",
+        ]
+
+        branch = "if"
+        for e, edge in enumerate(graph._out.get(name, [])):
+            target = index[edge.to_node]
+            if edge.condition_key is None:
+                if branch == "if":
+                    src.append(f"            i = {target}")
+                else:
+                    src += ["            else:", f"                i = {target}"]
+                break
+            namespace[f"c{k}_{e}"] = edge._cmp
+            namespace[f"k{k}_{e}"] = edge.condition_key
+            namespace[f"v{k}_{e}"] = edge.value
+            src += [
+                f"            {branch} c{k}_{e}(run.state.get(k{k}_{e}), v{k}_{e}):",
+                f"                i = {target}",
+            ]
+            branch = "elif"
+        else:
+            # no matching edge => terminate
+            if branch == "if":
+                src.append("            i = None")
+            else:
+                src += ["            else:", "                i = None"]
+
+    code = compile("\n".join(src), f"<graph {graph.id}>", "exec")
+    exec(code, namespace)
+    graph._compiled = namespace["_run"]
+    return graph._compiled
+
+
+async def execute_graph(
+    graph: GraphDef,
+    run: Run,
+    on_entry: Optional[Callable[[RunLogEntry], None]] = None,
+) -> None:
     run.status = RunStatus.RUNNING
-    node_name: Optional[str] = graph.start_node
-
+    # Copy-on-write state: each tool gets a CowState over `base`, the state
+    # as of the last log entry, and what it writes or deletes becomes that
+    # node's log entry. The first head starts with the initial state so the
+    # first entry holds the full state. Tools should assign new values
+    # rather than mutate existing ones in place.
+    base: Dict[str, Any] = {}
+    layer = CowState(dict(run.state), base)
+    run.state = layer  # type: ignore[assignment]
+
+    async def record(node_name: str) -> None:
+        nonlocal base, layer
+        if run.state is layer:
+            delta, removed = layer.head, list(layer.removed)
+            for key in removed:
+                del base[key]
+            base.update(delta)
+        elif not isinstance(run.state, Mapping):
+            raise TypeError(
+                f"Tool of node '{node_name}' returned {type(run.state).__name__}, not a mapping"
+            )
+        else:
+            # tool returned a different mapping: it replaces the state
+            new_base = dict(run.state)
+            delta = {k: v for k, v in new_base.items() if base.get(k, _MISSING) is not v}
+            removed = [k for k in base if k not in new_base]
+            base = new_base
+        layer = CowState({}, base)
+        run.state = layer  # type: ignore[assignment]
+
+        # append to log (delta against the previous entry)
+        entry = RunLogEntry(node_name, delta, removed)
+        run.log.append(entry)
+        if on_entry is not None:
+            on_entry(entry)
+        await run.notify_changed()
+
+    cache_token = run_cache.set({})
     try:
-        while node_name is not None:
-            run.current_node = node_name
-            node = graph.nodes[node_name]
-            tool = tool_registry.get(node.tool)
-
-            # call node tool
-            run.state = await tool(run.state)
-
-            # append to log (snapshot)
-            run.log.append(RunLogEntry(node=node_name, state_snapshot=run.state.copy()))
+        graph._runs += 1
+        if graph._runs > COMPILE_AFTER_RUNS:
+            await compile_graph(graph)(run, record)
+        else:
+            await _interpret(compile_plan(graph), run, record)
+        run.current_node = None
+        run.status = RunStatus.COMPLETED
+    except Exception as exc:
+        run.status = RunStatus.FAILED
+        run.error = str(exc)
+    finally:
+        run_cache.reset(cache_token)
+        try:
+            # a rejected return value never made it into the log, so fall
+            # back to the state as of the last entry
+            run.state = dict(run.state) if isinstance(run.state, CowState) else dict(base)
+        finally:
+            await run.notify_changed()
+
+
+# ------------ Process pool execution ------------
+
+_manager: Optional[Any] = None
+_updates: Optional[Any] = None
+_updates_lock = threading.Lock()
+# run id -> (loop, queue) of the execute_graph_in_pool call waiting on it
+_subscribers: Dict[str, Tuple[asyncio.AbstractEventLoop, "asyncio.Queue[Tuple[str, Any]]"]] = {}
+
+
+def _updates_queue() -> Any:
+    """
+    The queue all pool workers put (run id, kind, payload) messages on.
+    Plain multiprocessing queues cannot be pickled into executor calls, so a
+    manager queue is used. A single reader thread drains it and hands each
+    message to the event loop of the run it belongs to.
+    """
+    global _manager, _updates
+    with _updates_lock:
+        if _updates is None:
+            _manager = multiprocessing.Manager()
+            _updates = _manager.Queue()
+            threading.Thread(
+                target=_dispatch_updates, args=(_updates,), name="pool-updates", daemon=True
+            ).start()
+    return _updates
+
+
+def _dispatch_updates(updates: Any) -> None:
+    while True:
+        try:
+            run_id, kind, payload = updates.get()
+        except (EOFError, OSError):
+            return  # manager shut down
+        subscriber = _subscribers.get(run_id)
+        if subscriber is None:
+            continue
+        loop, inbox = subscriber
+        try:
+            loop.call_soon_threadsafe(inbox.put_nowait, (kind, payload))
+        except RuntimeError:
+            pass  # loop closed
+
+
+def _execute_in_worker(graph: GraphDef, run_id: str, state: Dict[str, Any], updates: Any) -> None:
+    run = Run(id=run_id, graph_id=graph.id, state=state)
+    asyncio.run(execute_graph(graph, run, on_entry=lambda entry: updates.put((run_id, "entry", entry))))
+    updates.put((run_id, "finished", (run.status, run.state, run.error)))
+
+
+def _pool_can_run(graph: GraphDef, pool_tools: Dict[str, Callable[[Dict[str, Any]], Any]]) -> bool:
+    # compares the registered functions, not their wrappers: registering the
+    # same function again keeps the graph in the pool
+    return all(
+        node.tool in pool_tools and tool_registry._funcs.get(node.tool) is pool_tools[node.tool]
+        for node in graph.nodes.values()
+    )
+
+
+async def execute_graph_in_pool(
+    pool: Executor,
+    graph: GraphDef,
+    run: Run,
+    pool_tools: Dict[str, Callable[[Dict[str, Any]], Any]],
+) -> None:
+    """
+    Runs the graph in a worker process so sync tools do not block the event
+    loop. Log entries are streamed back and applied to `run` as they arrive.
+
+    `pool_tools` are the tools the workers register themselves. Graphs using
+    any other tool, or one re-registered since, run in this process instead.
+    """
+    if not _pool_can_run(graph, pool_tools):
+        await execute_graph(graph, run)
+        return
+
+    loop = asyncio.get_running_loop()
+    updates = _updates_queue()
+    inbox: "asyncio.Queue[Tuple[str, Any]]" = asyncio.Queue()
+    _subscribers[run.id] = (loop, inbox)
+    run.status = RunStatus.RUNNING
+    graph._runs += 1
 
-            # compute next node (supports branching + loops)
-            node_name = _next_node_name(graph, node_name, run.state)
+    def on_worker_exit(future: Any) -> None:
+        # make sure the loop below wakes up if the worker dies
+        if future.cancelled():
+            inbox.put_nowait(("failed", "Worker cancelled"))
+        elif future.exception() is not None:
+            inbox.put_nowait(("failed", str(future.exception())))
 
+    try:
+        future = loop.run_in_executor(pool, _execute_in_worker, graph, run.id, run.state, updates)
+        future.add_done_callback(on_worker_exit)
+
+        while True:
+            kind, payload = await inbox.get()
+            if kind == "entry":
+                run.current_node = payload.node
+                payload.apply(run.state)
+                run.log.append(payload)
+                await run.notify_changed()
+            elif kind == "finished":
+                run.status, run.state, run.error = payload
+                break
+            else:
+                run.status = RunStatus.FAILED
+                run.error = payload
+                break
         run.current_node = None
-        run.status = RunStatus.COMPLETED
     except Exception as exc:
         run.status = RunStatus.FAILED
         run.error = str(exc)
+    finally:
+        _subscribers.pop(run.id, None)
+        await run.notify_changed()
@@ -0,0 +1,42 @@
+# app/id_pool.py
+from __future__ import annotations
+
+from functools import partial
+import os
+import weakref
+
+
+class IdPool:
+    """
+    Hands out random 128-bit hex ids, reading os.urandom in large chunks
+    so minting an id is a slice instead of a syscall.
+    """
+
+    def __init__(self, chunk: int = 4096) -> None:
+        self._chunk = chunk
+        self._buf = b""
+        self._i = 0
+        # a forked child would otherwise mint the parent's unused ids
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=partial(_reset_in_child, weakref.ref(self)))
+
+    def next(self) -> str:
+        if self._i + 16 > len(self._buf):
+            self._buf = os.urandom(self._chunk)
+            self._i = 0
+        b = self._buf[self._i:self._i + 16]
+        self._i += 16
+        return b.hex()
+
+    def _reset(self) -> None:
+        self._buf = b""
+        self._i = 0
+
+
+def _reset_in_child(ref: "weakref.ReferenceType[IdPool]") -> None:
+    pool = ref()
+    if pool is not None:
+        pool._reset()
+
+
+id_pool = IdPool()
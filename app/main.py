@@ -1,11 +1,13 @@
 # app/main.py
 from __future__ import annotations
 
-from typing import Any, Dict, List
-import uuid
-import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, List, Optional
+import os
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect
+from fastapi.responses import ORJSONResponse, Response
 from pydantic import BaseModel
 
 from .engine import (
@@ -16,15 +18,51 @@ from .engine import (
     RunStatus,
     GRAPHS,
     RUNS,
+    committed_state,
+    dumps_json,
     execute_graph,
+    execute_graph_in_pool,
+    serialize_log,
+    tool_registry,
 )
+from .id_pool import id_pool
 from .workflows_code_review import register_code_review_tools
 
-app = FastAPI(title="Mini Agent Workflow Engine")
+class JSONResponse(ORJSONResponse):
+    # orjson, but values it can't encode (e.g. ints wider than 64 bits in a
+    # run's state) fall back to stdlib json instead of failing the request
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+app = FastAPI(title="Mini Agent Workflow Engine", default_response_class=JSONResponse)
 
 # Register built-in tools (code review workflow)
 register_code_review_tools()
 
+# Worker processes for /graph/run_async, so CPU-bound sync tools run in
+# parallel instead of blocking the event loop. Workers register the same
+# built-in tools on start-up; graphs using tools registered later run
+# in-process. Created on first use, so the app can start again after a
+# shutdown.
+_pool: Optional[ProcessPoolExecutor] = None
+POOL_TOOLS = tool_registry.snapshot()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=register_code_review_tools)
+    return _pool
+
+
+@app.on_event("shutdown")
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
 
 # ---------- API models ----------
 
@@ -70,7 +108,7 @@ class RunStateResponse(BaseModel):
 
 @app.post("/graph/create", response_model=GraphCreateResponse)
 async def create_graph(req: GraphCreateRequest) -> GraphCreateResponse:
-    graph_id = str(uuid.uuid4())
+    graph_id = id_pool.next()
 
     nodes_dict = {n.name: n for n in req.nodes}
     if req.start_node not in nodes_dict:
@@ -87,8 +125,19 @@ async def create_graph(req: GraphCreateRequest) -> GraphCreateResponse:
     return GraphCreateResponse(graph_id=graph_id)
 
 
+def _with_log(fields: Dict[str, Any], run: Run) -> Response:
+    """
+    JSON response of `fields` plus the run's log. The log entries are cached
+    on the run already encoded, so they're spliced into the body as bytes
+    instead of being serialized again on every request.
+    """
+    body = dumps_json(fields)
+    log = b",".join(serialize_log(run))
+    return Response(body[:-1] + b',"log":[' + log + b"]}", media_type="application/json")
+
+
 @app.post("/graph/run", response_model=GraphRunResponse)
-async def run_graph(req: GraphRunRequest) -> GraphRunResponse:
+async def run_graph(req: GraphRunRequest) -> Response:
     """
     Synchronous execution: waits for the whole workflow to finish,
     then returns final_state + execution log.
@@ -97,24 +146,21 @@ async def run_graph(req: GraphRunRequest) -> GraphRunResponse:
     if not graph:
         raise HTTPException(status_code=404, detail="Graph not found")
 
-    run_id = str(uuid.uuid4())
+    run_id = id_pool.next()
     run = Run(
         id=run_id,
         graph_id=graph.id,
         status=RunStatus.PENDING,
         state=req.initial_state.copy(),
-        log=[],
     )
     RUNS[run_id] = run
 
     # Run in the current request
     await execute_graph(graph, run)
 
-    return GraphRunResponse(
-        run_id=run_id,
-        final_state=run.state,
-        status=run.status,
-        log=[entry.dict() for entry in run.log],
+    return _with_log(
+        {"run_id": run_id, "final_state": run.state, "status": run.status},
+        run,
     )
 
 
@@ -129,18 +175,17 @@ async def run_graph_async(req: GraphRunRequest, background_tasks: BackgroundTask
     if not graph:
         raise HTTPException(status_code=404, detail="Graph not found")
 
-    run_id = str(uuid.uuid4())
+    run_id = id_pool.next()
     run = Run(
         id=run_id,
         graph_id=graph.id,
         status=RunStatus.PENDING,
         state=req.initial_state.copy(),
-        log=[],
     )
     RUNS[run_id] = run
 
     # schedule background execution
-    background_tasks.add_task(execute_graph, graph, run)
+    background_tasks.add_task(execute_graph_in_pool, _get_pool(), graph, run, POOL_TOOLS)
 
     return GraphRunStartResponse(
         run_id=run_id,
@@ -149,63 +194,81 @@ async def run_graph_async(req: GraphRunRequest, background_tasks: BackgroundTask
 
 
 @app.get("/graph/state/{run_id}", response_model=RunStateResponse)
-async def get_run_state(run_id: str) -> RunStateResponse:
+async def get_run_state(run_id: str) -> Response:
     run = RUNS.get(run_id)
     if not run:
         raise HTTPException(status_code=404, detail="Run not found")
 
-    return RunStateResponse(
-        run_id=run.id,
-        graph_id=run.graph_id,
-        status=run.status,
-        current_node=run.current_node,
-        state=run.state,
-        log=[entry.dict() for entry in run.log],
-        error=run.error,
+    return _with_log(
+        {
+            "run_id": run.id,
+            "graph_id": run.graph_id,
+            "status": run.status,
+            "current_node": run.current_node,
+            "state": committed_state(run),
+            "error": run.error,
+        },
+        run,
     )
 
 
 # ---------- WebSocket: live log streaming ----------
 
+async def _send(websocket: WebSocket, obj: Any) -> None:
+    # orjson encodes far faster than send_json's stdlib json; sent as a text
+    # frame so clients still receive JSON text
+    await websocket.send_text(dumps_json(obj).decode())
+
+
 @app.websocket("/ws/run/{run_id}")
 async def websocket_run_logs(websocket: WebSocket, run_id: str):
     """
     Streams execution logs for a given run_id.
     Sends new log entries as they appear, until the run completes or fails.
+    Each message is a JSON array of the entries since the previous one; the
+    last message ends with the {"status", "done"} marker. An unknown run gets
+    [{"error": ...}].
     """
     await websocket.accept()
 
     if run_id not in RUNS:
-        await websocket.send_json({"error": "Run not found"})
+        await _send(websocket, [{"error": "Run not found"}])
         await websocket.close()
         return
 
     last_index = 0
+    snapshot: Dict[str, Any] = {}
 
     try:
         while True:
             run = RUNS.get(run_id)
             if not run:
-                await websocket.send_json({"error": "Run not found"})
+                await _send(websocket, [{"error": "Run not found"}])
                 break
 
-            # Send any new log entries
-            if len(run.log) > last_index:
-                new_entries = run.log[last_index:]
-                for entry in new_entries:
-                    await websocket.send_json({
-                        "node": entry.node,
-                        "state_snapshot": entry.state_snapshot,
-                        "status": run.status,
-                    })
-                last_index = len(run.log)
+            # Collect all new log entries into one frame; each is encoded
+            # right away so the running snapshot needn't be copied
+            frame: List[bytes] = []
+            for entry in islice(run.log, last_index, None):
+                entry.apply(snapshot)
+                frame.append(dumps_json({
+                    "node": entry.node,
+                    "state_snapshot": snapshot,
+                    "status": run.status,
+                }))
+            last_index += len(frame)
 
             # If finished and nothing more to send, close
-            if run.status in (RunStatus.COMPLETED, RunStatus.FAILED) and len(run.log) == last_index:
-                await websocket.send_json({"status": run.status, "done": True})
+            done = run.finished and len(run.log) == last_index
+            if done:
+                frame.append(dumps_json({"status": run.status, "done": True}))
+
+            if frame:
+                await websocket.send_text((b"[" + b",".join(frame) + b"]").decode())
+            if done:
                 break
 
-            await asyncio.sleep(0.3)
+            await run.wait_for_changes(last_index)
     except WebSocketDisconnect:
         # client disconnected, just stop
         return
@@ -227,7 +290,7 @@ async def create_sample_code_review_graph() -> GraphCreateResponse:
       If state['quality_ok'] == False after evaluate_quality,
       we go back to extract_functions. Otherwise, stop.
     """
-    graph_id = str(uuid.uuid4())
+    graph_id = id_pool.next()
 
     nodes = [
         NodeDef(name="extract_functions", tool="extract_functions"),
@@ -262,3 +325,27 @@ async def create_sample_code_review_graph() -> GraphCreateResponse:
 
     GRAPHS[graph_id] = graph
     return GraphCreateResponse(graph_id=graph_id)
+
+
+@app.post("/graph/create_sample/code_review_fused", response_model=GraphCreateResponse)
+async def create_sample_code_review_fused_graph() -> GraphCreateResponse:
+    """
+    Creates the Code Review workflow as a single node running the fused
+    code_review_all tool. Same final state as the sample above, but the log
+    has one entry per run instead of one per step.
+
+    There is no loop edge: the tools are deterministic, so running the
+    review again on the same code can't change quality_ok.
+    """
+    graph_id = id_pool.next()
+
+    node = NodeDef(name="code_review_all", tool="code_review_all")
+    graph = GraphDef(
+        id=graph_id,
+        nodes={node.name: node},
+        edges=[],
+        start_node=node.name,
+    )
+
+    GRAPHS[graph_id] = graph
+    return GraphCreateResponse(graph_id=graph_id)
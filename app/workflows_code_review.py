@@ -1,15 +1,78 @@
 # app/workflows_code_review.py
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Dict, List, NamedTuple, Tuple
 import re
 
-from .engine import tool_registry
+try:  # optional: google-re2 compiles the pattern to a DFA (no backtracking)
+    import re2 as _re_engine
+except ImportError:  # fall back to the stdlib engine
+    _re_engine = re
+
+from .engine import run_cache, tool_registry
+
+_DEF_RE = _re_engine.compile(r"def\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*\(")
+
+
+def _as_source(code: Any) -> str:
+    if isinstance(code, str):
+        return code
+    if isinstance(code, (bytes, bytearray, memoryview)):
+        # decode raw source instead of scanning its "b'...'" repr
+        return bytes(code).decode("utf-8", "replace")
+    return str(code)
 
 
 def _get_code(state: Dict[str, Any]) -> str:
-    code = state.get("code", "")
-    return code if isinstance(code, str) else str(code)
+    return _as_source(state.get("code", ""))
+
+
+def _is_batch(state: Dict[str, Any]) -> bool:
+    return isinstance(state.get("codes"), list)
+
+
+class _Scan(NamedTuple):
+    functions: Tuple[str, ...]
+    line_count: int  # non-empty lines
+    has_print: bool
+    has_todo: bool
+    has_double_space: bool
+
+
+def _scan(code: str) -> _Scan:
+    """
+    Everything the tools below need from the source. Each check is a single
+    C-level pass over the whole buffer.
+    """
+    return _Scan(
+        functions=tuple(_DEF_RE.findall(code)),
+        line_count=sum(1 for line in code.splitlines() if line and not line.isspace()),
+        has_print="print(" in code,
+        has_todo="TODO" in code,
+        has_double_space="  " in code,
+    )
+
+
+def _cached_scan(code: str) -> _Scan:
+    # kept in the run's cache, so the tools of a run (and each loop) scan
+    # every file only once, however large the batch
+    cache = run_cache.get()
+    if cache is None:
+        return _scan(code)
+    key = ("code_review_scan", code)
+    if key not in cache:
+        cache[key] = _scan(code)
+    return cache[key]
+
+
+def _get_scans(state: Dict[str, Any]) -> List[_Scan]:
+    """
+    One scan per file: state['codes'] when a batch of files is given,
+    otherwise just state['code'].
+    """
+    if _is_batch(state):
+        return [_cached_scan(_as_source(code)) for code in state["codes"]]
+    return [_cached_scan(_get_code(state))]
 
 
 # 1. Extract functions
@@ -17,9 +80,7 @@ def extract_functions(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Very naive function extraction: looks for `def name(` patterns.
     """
-    code = _get_code(state)
-    pattern = r"def\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*\("
-    names = re.findall(pattern, code)
+    names = [name for scan in _get_scans(state) for name in scan.functions]
 
     state["functions"] = names
     state["function_count"] = len(names)
@@ -27,30 +88,36 @@ def extract_functions(state: Dict[str, Any]) -> Dict[str, Any]:
 
 
 # 2. Check complexity (toy heuristic: longer code => more complex)
+def _complexity_score(line_count: int) -> int:
+    return min(10, max(1, line_count // 10))  # 1–10
+
+
 def check_complexity(state: Dict[str, Any]) -> Dict[str, Any]:
-    code = _get_code(state)
-    lines = [l for l in code.splitlines() if l.strip()]
-    line_count = len(lines)
-
-    # Simple heuristic complexity score
-    complexity_score = min(10, max(1, line_count // 10))  # 1–10
-    state["line_count"] = line_count
-    state["complexity_score"] = complexity_score
+    line_counts = [scan.line_count for scan in _get_scans(state)]
+
+    # Simple heuristic complexity score; for a batch of files the
+    # overall score is the worst file
+    scores = [_complexity_score(n) for n in line_counts]
+    if _is_batch(state):
+        state["line_counts"] = line_counts
+        state["complexity_scores"] = scores
+    state["line_count"] = sum(line_counts)
+    state["complexity_score"] = max(scores, default=1)
     return state
 
 
 # 3. Detect basic issues
 def detect_basic_issues(state: Dict[str, Any]) -> Dict[str, Any]:
-    code = _get_code(state)
+    scans = _get_scans(state)
     issues: List[str] = []
 
-    if "print(" in code:
+    if any(scan.has_print for scan in scans):
         issues.append("Debug prints present")
 
-    if "TODO" in code:
+    if any(scan.has_todo for scan in scans):
         issues.append("TODO comment found")
 
-    if "  " in code:
+    if any(scan.has_double_space for scan in scans):
         issues.append("Potential inconsistent indentation")
 
     state["issues"] = issues
@@ -97,10 +164,29 @@ def evaluate_quality(state: Dict[str, Any]) -> Dict[str, Any]:
     return state
 
 
+# 6. Whole review as a single tool
+def code_review_all(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs steps 1-5 in one call: within a run the code is scanned once
+    (shared by all steps) and the run takes one graph hop and one log entry.
+    For clients that don't need per-step visibility.
+    """
+    for step in (
+        extract_functions,
+        check_complexity,
+        detect_basic_issues,
+        suggest_improvements,
+        evaluate_quality,
+    ):
+        state = step(state)
+    return state
+
+
 # Register all tools in the registry at import time
 def register_code_review_tools() -> None:
     tool_registry.register("extract_functions", extract_functions)
     tool_registry.register("check_complexity", check_complexity)
     tool_registry.register("detect_basic_issues", detect_basic_issues)
-    tool_registry.register("suggest_improvements", suggest_improvements)
-    tool_registry.register("evaluate_quality", evaluate_quality)
+    tool_registry.register("suggest_improvements", suggest_improvements, is_cpu_bound=False)
+    tool_registry.register("evaluate_quality", evaluate_quality, is_cpu_bound=False)
+    tool_registry.register("code_review_all", code_review_all)
@@ -0,0 +1,83 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.engine import RunStatus
+from app.main import GraphRunResponse, RunStateResponse, app
+
+SAMPLE_STATE = {
+    "code": "def foo():\n    print('hi')\n    # TODO improve",
+    "quality_threshold": 7,
+}
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+def _sample_graph(client, kind="code_review"):
+    return client.post(f"/graph/create_sample/{kind}").json()["graph_id"]
+
+
+def test_run_matches_response_model(client):
+    graph_id = _sample_graph(client)
+    body = client.post("/graph/run", json={"graph_id": graph_id, "initial_state": SAMPLE_STATE}).json()
+
+    assert set(body) == set(GraphRunResponse.model_fields)
+    GraphRunResponse.model_validate(body)
+    assert body["status"] == RunStatus.COMPLETED
+    assert [e["node"] for e in body["log"]][:2] == ["extract_functions", "check_complexity"]
+    assert body["log"][-1]["state_snapshot"] == body["final_state"]
+
+
+def test_state_matches_response_model(client):
+    graph_id = _sample_graph(client)
+    run = client.post("/graph/run", json={"graph_id": graph_id, "initial_state": SAMPLE_STATE}).json()
+    body = client.get(f"/graph/state/{run['run_id']}").json()
+
+    assert set(body) == set(RunStateResponse.model_fields)
+    RunStateResponse.model_validate(body)
+    assert body["state"] == run["final_state"]
+    assert body["log"] == run["log"]
+
+
+def test_run_async_streams_log_over_websocket(client):
+    graph_id = _sample_graph(client)
+    request = {"graph_id": graph_id, "initial_state": SAMPLE_STATE}
+    expected = client.post("/graph/run", json=request).json()
+    run = client.post("/graph/run_async", json=request).json()
+
+    frames = []
+    with client.websocket_connect(f"/ws/run/{run['run_id']}") as ws:
+        while not frames or not frames[-1][-1].get("done"):
+            frames.append(ws.receive_json())
+    entries = [e for frame in frames for e in frame if "node" in e]
+
+    assert frames[-1][-1]["status"] == RunStatus.COMPLETED
+    assert [e["node"] for e in entries] == [e["node"] for e in expected["log"]]
+    assert entries[-1]["state_snapshot"] == expected["final_state"]
+    state = client.get(f"/graph/state/{run['run_id']}").json()
+    assert state["state"] == expected["final_state"]
+
+
+def test_unknown_run_is_404(client):
+    assert client.get("/graph/state/nope").status_code == 404
+
+
+def test_ints_wider_than_64_bits_are_encoded(client):
+    graph_id = _sample_graph(client)
+    big = {**SAMPLE_STATE, "x": 2**70}
+    run = client.post("/graph/run", json={"graph_id": graph_id, "initial_state": big})
+    assert run.status_code == 200
+    assert run.json()["final_state"]["x"] == 2**70
+
+    with client.websocket_connect(f"/ws/run/{run.json()['run_id']}") as ws:
+        frame = ws.receive_json()
+    assert frame[0]["state_snapshot"]["x"] == 2**70
+    assert frame[-1]["done"]
+
+
+def test_websocket_messages_are_arrays(client):
+    with client.websocket_connect("/ws/run/missing") as ws:
+        assert ws.receive_json() == [{"error": "Run not found"}]
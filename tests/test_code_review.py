@@ -0,0 +1,67 @@
+import asyncio
+
+import app.workflows_code_review as code_review
+from app.engine import EdgeDef, GraphDef, NodeDef, Run, RunStatus, execute_graph, run_cache
+from app.workflows_code_review import (
+    check_complexity,
+    code_review_all,
+    detect_basic_issues,
+    extract_functions,
+    register_code_review_tools,
+)
+
+
+def test_extract_functions_matches_across_lines():
+    state = extract_functions({"code": "def\nfoo(): pass\ndef bar (x):\n    return x\n"})
+    assert state["functions"] == ["foo", "bar"]
+    assert state["function_count"] == 2
+
+
+def test_scan_cache_stays_out_of_state():
+    state = code_review_all({"code": "def foo():\n    print(1)\n"})
+    assert not any(key.startswith("_") for key in state)
+
+
+def test_line_count_and_issues():
+    code = "def foo():\n    print(1)\n\n   \n# TODO\n"
+    state = detect_basic_issues(check_complexity({"code": code}))
+    assert state["line_count"] == 3
+    assert state["issues"] == [
+        "Debug prints present",
+        "TODO comment found",
+        "Potential inconsistent indentation",
+    ]
+
+
+def test_batch_of_files_reviews_every_file():
+    state = code_review_all({
+        "codes": ["def a():\n    print(1)\n", b"def b():\n    return 2\n"],
+        "quality_threshold": 10,
+    })
+    assert state["functions"] == ["a", "b"]
+    assert state["line_counts"] == [2, 2]
+    assert state["complexity_scores"] == [1, 1]
+    assert "Debug prints present" in state["issues"]
+    assert state["quality_ok"] is False
+
+
+def test_each_file_of_a_batch_is_scanned_once_per_run(monkeypatch):
+    scanned = []
+    scan = code_review._scan
+    monkeypatch.setattr(code_review, "_scan", lambda code: scanned.append(code) or scan(code))
+
+    register_code_review_tools()
+    names = ["extract_functions", "check_complexity", "detect_basic_issues"]
+    graph = GraphDef(
+        id="batch_scans",
+        nodes={name: NodeDef(name=name, tool=name) for name in names},
+        edges=[EdgeDef(from_node=a, to_node=b) for a, b in zip(names, names[1:])],
+        start_node=names[0],
+    )
+    codes = [f"def f{i}():\n    return {i}\n" for i in range(40)]
+    run = Run(id="r", graph_id=graph.id, state={"codes": codes})
+    asyncio.run(execute_graph(graph, run))
+
+    assert run.status == RunStatus.COMPLETED, run.error
+    assert sorted(scanned) == sorted(codes)
+    assert run_cache.get() is None
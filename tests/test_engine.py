@@ -0,0 +1,329 @@
+import asyncio
+import json
+import os
+import pickle
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+import app.engine as engine
+from app.engine import (
+    EdgeDef,
+    GraphDef,
+    NodeDef,
+    Run,
+    RunLogEntry,
+    RunStatus,
+    RunStore,
+    _pool_can_run,
+    committed_state,
+    execute_graph,
+    execute_graph_in_pool,
+    reconstruct_snapshot,
+    serialize_log,
+    tool_registry,
+)
+from app.workflows_code_review import register_code_review_tools
+
+
+def _chain(*tools, graph_id="chain"):
+    names = [f"n{i}" for i in range(len(tools))]
+    for name, tool in zip(names, tools):
+        tool_registry.register(f"{graph_id}_{name}", tool)
+    return GraphDef(
+        id=graph_id,
+        nodes={name: NodeDef(name=name, tool=f"{graph_id}_{name}") for name in names},
+        edges=[EdgeDef(from_node=a, to_node=b) for a, b in zip(names, names[1:])],
+        start_node=names[0],
+    )
+
+
+def _execute(graph, state=None):
+    run = Run(id="r", graph_id=graph.id, state=state or {})
+    asyncio.run(execute_graph(graph, run))
+    assert run.status == RunStatus.COMPLETED, run.error
+    return run
+
+
+def _branching_graph():
+    def inc(state):
+        state["n"] = state.get("n", 0) + 1
+        return state
+
+    def mark(state):
+        state["path"] = state.get("path", []) + [state["n"]]
+        return state
+
+    tool_registry.register("test_inc", inc)
+    tool_registry.register("test_mark", mark)
+    return GraphDef(
+        id="branching",
+        nodes={
+            "a": NodeDef(name="a", tool="test_inc"),
+            "m": NodeDef(name="m", tool="test_mark"),
+            "z": NodeDef(name="z", tool="test_mark"),
+        },
+        edges=[
+            EdgeDef(from_node="a", to_node="z", condition_key="n", operator="gte", value=4),
+            EdgeDef(from_node="a", to_node="m", condition_key="n", operator="eq", value=2),
+            EdgeDef(from_node="a", to_node="a"),
+            EdgeDef(from_node="m", to_node="a"),
+        ],
+        start_node="a",
+    )
+
+
+def _run(graph):
+    run = Run(id="r", graph_id=graph.id)
+    asyncio.run(execute_graph(graph, run))
+    return run.status, run.error, [e.node for e in run.log], run.state
+
+
+def test_compiled_runner_matches_interpreter(monkeypatch):
+    monkeypatch.setattr(engine, "COMPILE_AFTER_RUNS", 10**9)
+    interpreted = _run(_branching_graph())
+
+    monkeypatch.setattr(engine, "COMPILE_AFTER_RUNS", 0)
+    graph = _branching_graph()
+    compiled = _run(graph)
+
+    assert graph._compiled is not None
+    assert compiled == interpreted
+    assert interpreted[2] == ["a", "a", "m", "a", "a", "z"]
+    assert interpreted[3] == {"n": 4, "path": [2, 4]}
+
+
+def test_tool_returning_new_mapping_replaces_state():
+    def setk(state):
+        state["stale"] = 1
+        state["tmp"] = 1
+        return state
+
+    async def replace(state):
+        return {"only": 1}
+
+    def noop(state):
+        return state
+
+    run = _execute(_chain(setk, replace, noop, graph_id="replace"))
+    assert run.state == {"only": 1}
+    assert reconstruct_snapshot(run.log, 1) == {"only": 1}
+    assert reconstruct_snapshot(run.log, 0) == {"stale": 1, "tmp": 1}
+
+
+def test_pop_and_del_of_earlier_keys_are_recorded():
+    def setk(state):
+        state["tmp"] = 1
+        state["gone"] = 2
+        state["kept"] = 3
+        return state
+
+    def drop(state):
+        assert state.pop("tmp", None) == 1
+        del state["gone"]
+        assert "gone" not in state
+        assert state.pop("missing", "default") == "default"
+        return state
+
+    run = _execute(_chain(setk, drop, graph_id="drop"))
+    assert run.state == {"kept": 3}
+    assert sorted(run.log[1].removed) == ["gone", "tmp"]
+    assert reconstruct_snapshot(run.log, 1) == {"kept": 3}
+
+
+def _with_dead_ends(graph_id):
+    tool_registry.register(f"{graph_id}_ok", lambda state: {**state, "ok": True})
+    return GraphDef(
+        id=graph_id,
+        nodes={
+            "start": NodeDef(name="start", tool=f"{graph_id}_ok"),
+            "unreachable": NodeDef(name="unreachable", tool="nope"),
+            "never": NodeDef(name="never", tool="nope"),
+        },
+        edges=[
+            EdgeDef(from_node="start", to_node="never", condition_key="ok", value=False),
+            EdgeDef(from_node="start", to_node="missing", condition_key="ok", value=False),
+            EdgeDef(from_node="unreachable", to_node="start"),
+        ],
+        start_node="start",
+    )
+
+
+def test_unvisited_nodes_and_edges_are_not_resolved(monkeypatch):
+    for threshold in (10**9, 0):
+        monkeypatch.setattr(engine, "COMPILE_AFTER_RUNS", threshold)
+        run = _execute(_with_dead_ends(f"dead_ends_{threshold}"))
+        assert run.state == {"ok": True}
+
+
+def test_taking_an_edge_to_an_undefined_node_fails_the_run():
+    graph = GraphDef(
+        id="dangling",
+        nodes={"a": NodeDef(name="a", tool="dangling_ok")},
+        edges=[EdgeDef(from_node="a", to_node="missing")],
+        start_node="a",
+    )
+    tool_registry.register("dangling_ok", lambda state: state)
+    run = Run(id="r", graph_id=graph.id)
+    asyncio.run(execute_graph(graph, run))
+    assert run.status == RunStatus.FAILED
+    assert "missing" in run.error
+
+
+def test_pickled_graph_does_not_carry_compiled_state():
+    graph = _chain(lambda state: state, graph_id="pickled")
+    for _ in range(3):
+        _execute(graph)
+    copy = pickle.loads(pickle.dumps(graph))
+    assert graph._runs == 3
+    assert (copy._runs, copy._plan, copy._compiled) == (0, None, None)
+
+
+class _UnusablePool(Executor):
+    def submit(self, *args, **kwargs):
+        raise AssertionError("graph was sent to the pool")
+
+
+def test_graphs_with_tools_workers_lack_run_in_process():
+    graph = _chain(lambda state: {**state, "done": True}, graph_id="custom")
+    pool_tools = tool_registry.snapshot()
+    tool_registry.register("custom_n0", lambda state: {**state, "done": "again"})
+
+    for tools in ({}, pool_tools):
+        run = Run(id="r", graph_id=graph.id)
+        asyncio.run(execute_graph_in_pool(_UnusablePool(), graph, run, tools))
+        assert run.status == RunStatus.COMPLETED, run.error
+        assert run.state == {"done": "again"}
+
+
+def test_concurrent_pool_runs_stream_their_own_entries():
+    register_code_review_tools()
+    graph = GraphDef(
+        id="pooled",
+        nodes={
+            "extract": NodeDef(name="extract", tool="extract_functions"),
+            "complexity": NodeDef(name="complexity", tool="check_complexity"),
+        },
+        edges=[EdgeDef(from_node="extract", to_node="complexity")],
+        start_node="extract",
+    )
+    runs = [
+        Run(id=f"r{i}", graph_id=graph.id, state={"code": f"def f{i}():\n    pass\n"})
+        for i in range(4)
+    ]
+
+    async def run_all(pool):
+        tools = tool_registry.snapshot()
+        await asyncio.gather(*(execute_graph_in_pool(pool, graph, run, tools) for run in runs))
+
+    with ProcessPoolExecutor(max_workers=2, initializer=register_code_review_tools) as pool:
+        asyncio.run(run_all(pool))
+
+    for i, run in enumerate(runs):
+        assert run.status == RunStatus.COMPLETED, run.error
+        assert run.state["functions"] == [f"f{i}"]
+        assert [entry.node for entry in run.log] == ["extract", "complexity"]
+
+
+def test_evicted_runs_are_archived_to_disk():
+    store = RunStore(maxsize=1)
+    store["a"] = Run(id="a", graph_id="g", status=RunStatus.COMPLETED, state={"x": 1})
+    store["b"] = Run(id="b", graph_id="g")
+
+    assert len(store) == 1
+    assert store.get("a").state == {"x": 1}  # readable while the write is pending
+    store._writer.shutdown(wait=True)
+    assert not store._pending
+    assert os.path.getsize(store._archive_path) > 0
+    assert store.get("a").state == {"x": 1}
+    store._remove_archive()
+    assert not os.path.exists(store._archive_path)
+
+
+def test_runs_become_evictable_when_they_finish():
+    graph = _chain(lambda state: state, graph_id="evictable")
+    store = RunStore(maxsize=2)
+    runs = [Run(id=f"r{i}", graph_id=graph.id) for i in range(3)]
+    for run in runs:
+        store[run.id] = run
+    assert len(store) == 3  # nothing has finished, so nothing is evicted
+
+    asyncio.run(execute_graph(graph, runs[1]))
+    assert len(store) == 2
+    store._writer.shutdown(wait=True)
+    assert store._load("r1").status == RunStatus.COMPLETED
+    assert store.get("r0") is runs[0] and store.get("r2") is runs[2]
+    store._remove_archive()
+
+
+def test_tool_returning_a_non_mapping_fails_the_run():
+    graph = _chain(lambda state: {**state, "a": 1}, lambda state: None, graph_id="returns_none")
+    store = RunStore()
+    run = Run(id="r", graph_id=graph.id)
+    store[run.id] = run
+
+    async def run_with_listener():
+        listener = asyncio.ensure_future(run.wait_for_changes(len(graph.nodes)))
+        await execute_graph(graph, run)
+        await asyncio.wait_for(listener, timeout=1)
+
+    asyncio.run(run_with_listener())
+    assert run.status == RunStatus.FAILED
+    assert "not a mapping" in run.error
+    assert run.state == {"a": 1}
+    assert run.id in store._finished
+
+
+def test_reregistered_tool_replaces_the_old_one(monkeypatch):
+    for threshold in (10**9, 0):
+        monkeypatch.setattr(engine, "COMPILE_AFTER_RUNS", threshold)
+        graph = _chain(lambda state: {"v": 1}, graph_id=f"reregistered_{threshold}")
+        assert _execute(graph).state == {"v": 1}
+        tool_registry.register(f"reregistered_{threshold}_n0", lambda state: {"v": 2})
+        assert _execute(graph).state == {"v": 2}
+
+
+def test_serialized_log_only_encodes_new_entries():
+    run = _execute(_chain(lambda state: {**state, "a": 1}, graph_id="encoded"))
+    first = serialize_log(run)[0]
+    run.log.append(RunLogEntry("extra", {"b": 2}))
+
+    encoded = serialize_log(run)
+    assert encoded[0] is first
+    assert json.loads(encoded[1]) == {"node": "extra", "state_snapshot": {"a": 1, "b": 2}}
+
+
+def test_committed_state_ignores_writes_of_the_running_tool():
+    started, release = threading.Event(), threading.Event()
+
+    def slow(state):
+        state["partial"] = 1
+        started.set()
+        release.wait(5)
+        return state
+
+    graph = _chain(lambda state: {**state, "a": 1}, slow, graph_id="slow")
+    run = Run(id="r", graph_id=graph.id)
+
+    async def read_while_running():
+        task = asyncio.ensure_future(execute_graph(graph, run))
+        await asyncio.to_thread(started.wait, 5)
+        seen = dict(committed_state(run))
+        release.set()
+        await task
+        return seen
+
+    assert asyncio.run(read_while_running()) == {"a": 1}
+    assert committed_state(run) == {"a": 1, "partial": 1}
+
+
+def test_registering_the_same_tools_again_keeps_graphs_in_the_pool():
+    register_code_review_tools()
+    pool_tools = tool_registry.snapshot()
+    register_code_review_tools()
+    graph = GraphDef(
+        id="builtin",
+        nodes={"extract": NodeDef(name="extract", tool="extract_functions")},
+        edges=[],
+        start_node="extract",
+    )
+    assert _pool_can_run(graph, pool_tools)
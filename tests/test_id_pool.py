@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+from app.id_pool import IdPool
+
+
+def test_ids_are_unique_hex_across_refills():
+    pool = IdPool(chunk=64)  # four ids per read
+    ids = [pool.next() for _ in range(50)]
+
+    assert len(set(ids)) == len(ids)
+    assert all(len(i) == 32 and int(i, 16) >= 0 for i in ids)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_child_does_not_reuse_the_parents_buffer():
+    pool = IdPool()
+    pool.next()  # fill the buffer before forking
+
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(write, pool.next().encode())
+        os._exit(0)
+    os.close(write)
+    os.waitpid(pid, 0)
+    child_id = os.read(read, 64).decode()
+    os.close(read)
+
+    assert len(child_id) == 32
+    assert child_id != pool.next()